@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+import os
+import time
+from fs_utils import ensure_dir
+
+# Cache disque des réponses cardinfo.php (YGOPRODECK_NO_CACHE=1 pour toujours interroger l'API)
+CACHE_DIR = ".cache"
+CACHE_MAX_AGE = 24 * 3600  # secondes
+USE_CACHE = not os.environ.get('YGOPRODECK_NO_CACHE')
+
+def fresh_cache_path(name):
+    """Chemin de l'entrée de cache name si elle a moins d'une journée, sinon None"""
+    if not USE_CACHE:
+        return None
+    path = os.path.join(CACHE_DIR, name)
+    try:
+        if time.time() - os.stat(path).st_mtime < CACHE_MAX_AGE:
+            return path
+    except OSError:
+        pass
+    return None
+
+def read_cache(name):
+    """Contenu brut (bytes) de l'entrée de cache name si elle est valide, sinon None"""
+    path = fresh_cache_path(name)
+    if path is None:
+        return None
+    try:
+        with open(path, 'rb') as file:
+            return file.read()
+    except OSError:
+        return None
+
+def write_cache(name, content):
+    """Enregistre content (bytes) dans le cache ; facultatif, une erreur d'écriture n'est qu'un avertissement"""
+    if not USE_CACHE:
+        return
+    path = os.path.join(CACHE_DIR, name)
+    try:
+        ensure_dir(CACHE_DIR)
+        with open(path, 'wb') as file:
+            file.write(content)
+    except OSError as e:
+        print(f"⚠️ Impossible d'écrire le cache {path}: {e}")
@@ -1,44 +1,137 @@
 #!/usr/bin/env python3
+import functools
+import importlib.util
 import json
+import multiprocessing
 import sys
 import os
-import requests
+import httpx
 import re
+import string
 import time
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from PIL import Image
 from io import BytesIO
+from api_cache import read_cache, write_cache
+from fs_utils import ensure_dir
+from json_utils import COMPACT_OUTPUT, JSON_ERRORS, get_json, json_loads, write_json_atomic, write_json_bytes
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 # Configuration API
 API_BASE_URL = "https://db.ygoprodeck.com/api/v7"
 CARDSETS_ENDPOINT = f"{API_BASE_URL}/cardsets.php"
 CARDINFO_ENDPOINT = f"{API_BASE_URL}/cardinfo.php"
 
+MANIFEST_PATH = "manifest.json"
+# Cache local des IDs max et des archétypes, invalidé par les mtime des dossiers
+SCAN_CACHE_PATH = ".scan_cache.json"
+
+# HTTP/2 nécessite le paquet h2 (pip install "httpx[http2]")
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+# Parallélisme des appels API
+FETCH_MAX_WORKERS = 8
+CARDINFO_MAX_CONCURRENCY = 4
+CARDINFO_MAX_RETRIES = 3
+IMAGE_MAX_WORKERS = 16
+
+# À partir de ce nombre de nouveaux sets, télécharger la base complète une seule fois
+BULK_FETCH_THRESHOLD = 10
+
+# Classification des sets : mots-clés du nom -> type, par ordre de priorité
+_SET_TYPE_KEYWORDS = (
+    ('starter', 'starter'),
+    ('deck', 'starter'),
+    ('booster', 'booster'),
+    ('structure', 'structure'),
+)
+_SET_TYPE_RE = re.compile('|'.join(keyword for keyword, _ in _SET_TYPE_KEYWORDS))
+
+class _NormalizeTable(dict):
+    """Table str.translate qui ne garde que [a-z0-9] (remplie à la demande)"""
+    _KEEP = frozenset(string.ascii_lowercase + string.digits)
+    
+    def __missing__(self, codepoint):
+        value = codepoint if chr(codepoint) in self._KEEP else None
+        self[codepoint] = value
+        return value
+
+_NORMALIZE_TABLE = _NormalizeTable()
+
+@functools.lru_cache(maxsize=4096)
+def normalize_name(name):
+    """Garde uniquement [a-z0-9] et limite à 10 caractères (résultats mis en cache)"""
+    return name.lower().translate(_NORMALIZE_TABLE)[:10]
+
+def encode_card_webp(image_bytes, output_path):
+    """Convertit une image de carte en WebP (exécuté dans un processus du pool d'encodage)"""
+    image = Image.open(BytesIO(image_bytes))
+    
+    # Convertir en RGB si nécessaire
+    if image.mode == 'P' and 'transparency' in image.info:
+        image = image.convert('RGBA')
+    if image.mode == 'RGBA' and image.getextrema()[-1] != (255, 255):
+        # Fond blanc seulement si l'image a réellement de la transparence
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    # Sauvegarder en WebP (method=0 : encodage rapide)
+    image.save(output_path, "WEBP", quality=95, method=0)
+
 class YuGiOhAutoSync:
-    def __init__(self):
+    # Types de base reconnus dans le type API, par ordre de priorité
+    _TYPE_PRIORITY = ('Normal', 'Effect', 'Fusion', 'Synchro', 'Xyz', 'Link', 'Ritual', 'Spell', 'Trap')
+    
+    def __init__(self, dry_run=False):
+        # Sorties de debug détaillées (AUTOSYNC_DEBUG=1)
+        self.debug = bool(os.environ.get('AUTOSYNC_DEBUG'))
+        # En dry-run, aucun fichier n'est écrit, caches compris
+        self.dry_run = dry_run
+        # Client partagé : connexions TCP/TLS réutilisées et multiplexées en HTTP/2
+        transport = httpx.HTTPTransport(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            retries=3
+        )
+        self.client = httpx.Client(transport=transport, timeout=30.0, follow_redirects=True)
+        # Pool de processus pour l'encodage WebP, créé au premier besoin
+        self.encode_pool = None
+        # Limite le nombre d'appels simultanés à cardinfo.php
+        self.cardinfo_semaphore = threading.Semaphore(CARDINFO_MAX_CONCURRENCY)
         self.existing_sets = self.load_existing_sets()
-        self.max_archetype_id = self.get_max_archetype_id()
-        self.max_collection_id = self.get_max_collection_id()
+        self.max_archetype_id, self.existing_archetypes, self.max_collection_id = self.load_scan_cache()
+        # Manifest gardé en mémoire pendant toute l'exécution
+        self.manifest = self.load_manifest()
+        # Images déjà présentes, pour éviter un stat() par image
+        self.downloaded_card_images = self.scan_filenames("cards-image")
+        self.downloaded_collection_images = self.scan_filenames("collections-image")
         
     def fetch_all_cardsets(self):
         """Récupère tous les sets depuis l'API YGOPRODeck"""
         try:
             print("🔄 Récupération de tous les sets depuis l'API...")
-            response = requests.get(CARDSETS_ENDPOINT, timeout=30)
-            response.raise_for_status()
-            
-            cardsets_data = response.json()
+            cardsets_data = get_json(self.client, CARDSETS_ENDPOINT)
             
             # 🐛 DEBUG: Dump des données de sets
-            print(f"\n🐛 DEBUG - Structure d'un set (premier élément):")
-            if cardsets_data:
+            if self.debug and cardsets_data:
                 import pprint
+                print(f"\n🐛 DEBUG - Structure d'un set (premier élément):")
                 pprint.pprint(cardsets_data[0])
                 print(f"\n🐛 DEBUG - Clés disponibles dans un set: {list(cardsets_data[0].keys())}")
             print(f"✅ {len(cardsets_data)} sets récupérés depuis l'API")
             return cardsets_data
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"❌ Erreur lors de la récupération des sets: {e}")
             return []
         except json.JSONDecodeError as e:
@@ -47,115 +140,171 @@ class YuGiOhAutoSync:
     
     def load_existing_sets(self):
         """Charge tous les sets existants depuis les dossiers locaux"""
-        existing_sets = set()
-        
-        # Vérifier les archétypes
-        archetypes_dir = "archetypes"
-        if os.path.exists(archetypes_dir):
-            for filename in os.listdir(archetypes_dir):
-                if filename.endswith('.json') and filename != 'base.json':
-                    set_code = filename.replace('.json', '')
-                    existing_sets.add(set_code)
-        
-        # Vérifier les collections
-        collections_dir = "collections"
-        if os.path.exists(collections_dir):
-            for filename in os.listdir(collections_dir):
-                if filename.endswith('.json') and filename != 'base.json':
-                    set_code = filename.replace('.json', '')
-                    existing_sets.add(set_code)
-        
-        # Vérifier les cartes
-        cards_dir = "cards"
-        if os.path.exists(cards_dir):
-            for filename in os.listdir(cards_dir):
-                if filename.endswith('.json') and filename != 'base.json':
-                    set_code = filename.replace('.json', '')
-                    existing_sets.add(set_code)
+        # Vérifier les archétypes, les collections et les cartes
+        existing_sets = {
+            entry.name[:-5]
+            for directory in ("archetypes", "collections", "cards")
+            if os.path.isdir(directory)
+            for entry in os.scandir(directory)
+            if entry.name.endswith('.json') and entry.name != 'base.json'
+        }
         
         print(f"📁 {len(existing_sets)} sets existants trouvés localement")
         return existing_sets
     
-    def get_max_archetype_id(self):
-        """Récupère l'ID maximum utilisé dans tous les fichiers d'archétypes"""
+    def _dir_signature(self, directory):
+        """Signature d'un dossier : nombre de fichiers JSON et somme de leurs mtime"""
+        count = total_mtime = 0
+        if os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                if entry.name.endswith('.json') and entry.is_file():
+                    count += 1
+                    total_mtime += entry.stat().st_mtime_ns
+        return [count, total_mtime]
+    
+    def _scan_signature(self):
+        """Signature des dossiers dont dépend le cache de scan"""
+        return {
+            "archetypes": self._dir_signature("archetypes"),
+            "collections": self._dir_signature("collections")
+        }
+    
+    def load_scan_cache(self):
+        """Retourne (ID archétype max, noms d'archétypes, ID collection max), depuis le cache si valide"""
+        try:
+            with open(SCAN_CACHE_PATH, 'rb') as file:
+                cache = json_loads(file.read())
+            if cache.get("signature") == self._scan_signature():
+                return cache["max_archetype_id"], set(cache["archetype_names"]), cache["max_collection_id"]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass
+        
+        # Cache absent ou périmé : scan complet puis réécriture du cache (sauf en dry-run)
+        max_archetype_id, existing_archetypes = self._scan_archetypes()
+        max_collection_id = self.get_max_collection_id()
+        if not self.dry_run:
+            self.save_scan_cache(max_archetype_id, existing_archetypes, max_collection_id)
+        return max_archetype_id, existing_archetypes, max_collection_id
+    
+    def save_scan_cache(self, max_archetype_id, existing_archetypes, max_collection_id):
+        """Enregistre le cache de scan avec la signature actuelle des dossiers"""
+        try:
+            write_json_bytes(SCAN_CACHE_PATH, {
+                "signature": self._scan_signature(),
+                "max_archetype_id": max_archetype_id,
+                "archetype_names": sorted(existing_archetypes),
+                "max_collection_id": max_collection_id
+            })
+        except OSError as e:
+            print(f"⚠️ Impossible d'écrire le cache {SCAN_CACHE_PATH}: {e}")
+    
+    def _scan_archetypes(self):
+        """Parcourt une seule fois les archétypes et retourne (ID maximum, noms anglais existants)"""
         max_id = 0
+        existing_archetypes = set()
         archetypes_dir = "archetypes"
         
-        if os.path.exists(archetypes_dir):
-            for filename in os.listdir(archetypes_dir):
-                if filename.endswith('.json'):
-                    filepath = os.path.join(archetypes_dir, filename)
-                    try:
-                        with open(filepath, 'r', encoding='utf-8') as file:
-                            archetype_data = json.load(file)
-                            for archetype in archetype_data:
-                                try:
-                                    archetype_id = int(archetype.get('id', 0))
-                                    max_id = max(max_id, archetype_id)
-                                except (ValueError, TypeError):
-                                    pass
-                    except Exception as e:
-                        print(f"⚠️ Erreur lors du chargement de {filepath}: {e}")
+        if not os.path.isdir(archetypes_dir):
+            return max_id, existing_archetypes
         
-        return max_id
+        for entry in os.scandir(archetypes_dir):
+            if not entry.name.endswith('.json') or not entry.is_file():
+                continue
+            try:
+                with open(entry.path, 'rb') as file:
+                    archetype_data = json_loads(file.read())
+            except Exception as e:
+                print(f"⚠️ Erreur lors du chargement de {entry.path}: {e}")
+                continue
+            
+            if not isinstance(archetype_data, list):
+                continue
+            for archetype in archetype_data:
+                if 'nameEn' in archetype:
+                    existing_archetypes.add(archetype['nameEn'])
+                try:
+                    max_id = max(max_id, int(archetype.get('id', 0)))
+                except (ValueError, TypeError):
+                    pass
+        
+        return max_id, existing_archetypes
+    
+    def scan_filenames(self, directory):
+        """Retourne l'ensemble des noms de fichiers d'un dossier (vide s'il n'existe pas)"""
+        if not os.path.isdir(directory):
+            return set()
+        return {entry.name for entry in os.scandir(directory)}
     
     def get_max_collection_id(self):
         """Récupère l'ID de collection le plus élevé depuis les fichiers existants"""
         max_id = 0
         collections_dir = "collections"
         
-        if os.path.exists(collections_dir):
-            for filename in os.listdir(collections_dir):
-                if filename.endswith('.json') and filename != 'base.json':
-                    filepath = os.path.join(collections_dir, filename)
-                    try:
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            if isinstance(data, list) and len(data) > 0:
-                                collection_id = data[0].get('id', 0)
-                                if isinstance(collection_id, int):
-                                    max_id = max(max_id, collection_id)
-                    except (json.JSONDecodeError, KeyError, IndexError):
-                        continue
+        if not os.path.isdir(collections_dir):
+            return max_id
+        
+        for entry in os.scandir(collections_dir):
+            if not entry.name.endswith('.json') or entry.name == 'base.json' or not entry.is_file():
+                continue
+            try:
+                with open(entry.path, 'rb') as f:
+                    data = json_loads(f.read())
+                if isinstance(data, list) and len(data) > 0:
+                    collection_id = data[0].get('id', 0)
+                    if isinstance(collection_id, int):
+                        max_id = max(max_id, collection_id)
+            except (json.JSONDecodeError, KeyError, IndexError):
+                continue
         
         return max_id
     
     def normalize_set_name(self, set_name):
         """Normalise le nom d'un set pour créer un code de fichier"""
-        # Supprimer les caractères spéciaux et espaces
-        normalized = re.sub(r'[^a-zA-Z0-9]', '', set_name.lower())
-        # Limiter à 10 caractères maximum
-        return normalized[:10] if len(normalized) > 10 else normalized
+        # Supprimer les caractères spéciaux et espaces, limiter à 10 caractères
+        return normalize_name(set_name)
     
     def compare_sets(self, api_sets):
         """Compare les sets de l'API avec les sets existants"""
         new_sets = []
+        existing_sets = self.existing_sets
         
         for api_set in api_sets:
             set_name = api_set.get('set_name', '')
             set_code = api_set.get('set_code', '')
             
             # SOLUTION 1: Utiliser prioritairement le set_code
-            # Essayer différentes variantes du code pour la comparaison
-            possible_codes = [
-                set_code.lower(),                   # Code principal (ex: "ys15", "stax")
+            # Code principal (ex: "ys15", "stax"), testé seul car c'est le cas le plus fréquent
+            main_code = set_code.lower()
+            if main_code in existing_sets:
+                continue
+            
+            # Essayer les autres variantes du code pour la comparaison
+            other_codes = (
                 self.normalize_set_name(set_code),  # Code normalisé
                 self.normalize_set_name(set_name),  # Nom normalisé (fallback)
                 set_name.lower().replace(' ', '').replace('-', '')[:10]  # Nom simplifié (fallback)
-            ]
+            )
             
             # Vérifier si ce set existe déjà
-            exists = any(code in self.existing_sets for code in possible_codes)
-            
-            if not exists:
+            if existing_sets.isdisjoint(other_codes):
                 new_sets.append({
                     'api_data': api_set,
-                    'suggested_code': possible_codes[0]  # Utiliser le set_code.lower() comme suggestion
+                    'suggested_code': main_code  # Utiliser le set_code.lower() comme suggestion
                 })
         
         print(f"🆕 {len(new_sets)} nouveaux sets détectés")
         return new_sets
     
+    def get_cardinfo(self, params):
+        """Appelle cardinfo.php en limitant la concurrence et en réessayant sur HTTP 429"""
+        with self.cardinfo_semaphore:
+            for attempt in range(CARDINFO_MAX_RETRIES + 1):
+                response = self.client.get(CARDINFO_ENDPOINT, params=params)
+                if response.status_code != 429 or attempt == CARDINFO_MAX_RETRIES:
+                    return response
+                print(f"⏳ Limite de l'API atteinte (HTTP 429), nouvelle tentative dans {2 ** attempt}s...")
+                time.sleep(2 ** attempt)
+    
     def fetch_cards_for_set(self, set_name):
         """Récupère toutes les cartes d'un set spécifique"""
         try:
@@ -164,11 +313,11 @@ class YuGiOhAutoSync:
             # Première tentative avec language=fr
             print(f"🇫🇷 Tentative avec language=fr...")
             params_fr = {'cardset': set_name, 'language': 'fr'}
-            response = requests.get(CARDINFO_ENDPOINT, params=params_fr, timeout=30)
+            response = self.get_cardinfo(params_fr)
             
             if response.status_code == 200:
                 try:
-                    cards_data = response.json()
+                    cards_data = json_loads(response.content)
                     if 'data' in cards_data and cards_data['data']:
                         cards = cards_data['data']
                         print(f"✅ {len(cards)} cartes récupérées en français pour {set_name}")
@@ -183,10 +332,10 @@ class YuGiOhAutoSync:
             # Deuxième tentative sans language (par défaut en anglais)
             print(f"🇬🇧 Tentative sans paramètre language...")
             params = {'cardset': set_name}
-            response = requests.get(CARDINFO_ENDPOINT, params=params, timeout=30)
+            response = self.get_cardinfo(params)
             response.raise_for_status()
             
-            cards_data = response.json()
+            cards_data = json_loads(response.content)
             if 'data' in cards_data:
                 cards = cards_data['data']
                 print(f"✅ {len(cards)} cartes récupérées en anglais pour {set_name}")
@@ -195,26 +344,87 @@ class YuGiOhAutoSync:
                 print(f"⚠️ Aucune carte trouvée pour {set_name}")
                 return []
                 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"❌ Erreur lors de la récupération des cartes pour {set_name}: {e}")
             return []
         except json.JSONDecodeError as e:
             print(f"❌ Erreur de décodage JSON pour {set_name}: {e}")
             return []
     
+    def fetch_cardinfo_dump(self, language=None, use_cache=True):
+        """Récupère (JSON brut en bytes, lu depuis le cache) de la base complète dans une langue, cache disque d'une journée"""
+        cache_name = f"cardinfo-{language or 'en'}.json"
+        if use_cache:
+            cached = read_cache(cache_name)
+            if cached is not None:
+                return cached, True
+        
+        print(f"🔄 Téléchargement de la base complète des cartes ({language or 'en'})...")
+        response = self.get_cardinfo({'language': language} if language else {})
+        response.raise_for_status()
+        
+        if not self.dry_run:
+            write_cache(cache_name, response.content)
+        return response.content, False
+    
+    def group_dump_by_set(self, content, set_names):
+        """Regroupe par set les cartes de la base complète, sans garder celles des autres sets"""
+        # Avec ijson, les cartes sont décodées une à une : seules celles des sets voulus restent en mémoire
+        if ijson is not None:
+            dump = ijson.items(BytesIO(content), 'data.item', use_float=True)
+        else:
+            dump = json_loads(content).get('data', [])
+        
+        grouped = {}
+        for card in dump:
+            for card_set in card.get('card_sets') or ():
+                set_name = card_set.get('set_name')
+                if set_name in set_names:
+                    cards = grouped.setdefault(set_name, [])
+                    # Une carte peut apparaître plusieurs fois dans un set (raretés)
+                    if not cards or cards[-1] is not card:
+                        cards.append(card)
+        return grouped
+    
+    def fetch_cards_for_sets(self, set_names):
+        """Récupère les cartes de plusieurs sets depuis la base complète, regroupées par nom de set"""
+        wanted = set(set_names)
+        cards_by_set = {}
+        
+        # Même logique que fetch_cards_for_set : français d'abord, puis anglais pour les sets manquants
+        for language in ('fr', None):
+            missing = wanted - cards_by_set.keys()
+            if not missing:
+                break
+            try:
+                content, from_cache = self.fetch_cardinfo_dump(language)
+                try:
+                    grouped = self.group_dump_by_set(content, missing)
+                except JSON_ERRORS:
+                    if not from_cache:
+                        raise
+                    # Cache illisible : retélécharger la base
+                    content, _ = self.fetch_cardinfo_dump(language, use_cache=False)
+                    grouped = self.group_dump_by_set(content, missing)
+            except Exception as e:
+                print(f"❌ Erreur lors de la récupération de la base complète ({language or 'en'}): {e}")
+                continue
+            # Libérer le JSON brut avant de passer à la langue suivante
+            del content
+            cards_by_set.update(grouped)
+        
+        print(f"✅ Cartes trouvées pour {len(cards_by_set)}/{len(wanted)} sets dans la base complète")
+        return cards_by_set
+    
     def create_collection_structure(self, set_data, set_code, cards):
         """Crée la structure JSON pour une collection (format array avec un objet)"""
         
         # Déterminer le type de set basé sur le nom
-        set_name_lower = set_data['set_name'].lower()
-        if 'starter' in set_name_lower or 'deck' in set_name_lower:
-            set_type = "starter"
-        elif 'booster' in set_name_lower:
-            set_type = "booster"
-        elif 'structure' in set_name_lower:
-            set_type = "structure"
-        else:
-            set_type = "booster"  # par défaut
+        found = set(_SET_TYPE_RE.findall(set_data['set_name'].lower()))
+        set_type = next(
+            (set_type for keyword, set_type in _SET_TYPE_KEYWORDS if keyword in found),
+            "booster"  # par défaut
+        )
         
         collection = {
             "id": set_code.lower(),  # Utiliser le code du set en minuscules
@@ -228,60 +438,46 @@ class YuGiOhAutoSync:
         # Retourner un array avec un seul objet (format existant)
         return [collection]
     
-    def create_cards_structure(self, cards, set_code):
+    def create_cards_structure(self, cards, set_code, debug=False):
         """Crée la structure JSON pour les cartes d'un set (format attendu)"""
         cards_structure = []
         
         for card in cards:
+            g = card.get
             # Convertir l'ID de -EN vers -FR
-            card_id_fr = str(card.get('id')).replace('-EN', '-FR') if card.get('id') else None
-            print(card)
+            card_id = g('id')
+            card_id_fr = str(card_id).replace('-EN', '-FR') if card_id else None
+            if debug:
+                print(card)
             # Déterminer le type de monstre et les propriétés
-            card_type = card.get('type', '')
-            is_effect = 'Effect' in card_type
-            is_pendulum = 'Pendulum' in card_type
-            is_link = 'Link' in card_type
+            card_type = g('type', '') or ''
+            type_tokens = set(card_type.split())
+            is_effect = 'Effect' in type_tokens
+            is_pendulum = 'Pendulum' in type_tokens
+            is_link = 'Link' in type_tokens
             
             # Extraire le type de base (Normal, Effect, etc.)
-            if 'Normal' in card_type:
-                base_type = 'Normal'
-            elif 'Effect' in card_type:
-                base_type = 'Effect'
-            elif 'Fusion' in card_type:
-                base_type = 'Fusion'
-            elif 'Synchro' in card_type:
-                base_type = 'Synchro'
-            elif 'Xyz' in card_type:
-                base_type = 'Xyz'
-            elif 'Link' in card_type:
-                base_type = 'Link'
-            elif 'Ritual' in card_type:
-                base_type = 'Ritual'
-            elif 'Spell' in card_type:
-                base_type = 'Spell'
-            elif 'Trap' in card_type:
-                base_type = 'Trap'
-            else:
-                base_type = 'Normal'
+            base_type = next((t for t in self._TYPE_PRIORITY if t in type_tokens), 'Normal')
             
+            card_name = g('name')
             card_structure = {
                 "id": card_id_fr,
-                "name": card.get('name'),
-                "nameEn": card.get('name'),
-                "attribute": card.get('attribute'),
-                "atk": card.get('atk'),
-                "def": card.get('def'),
-                "level": card.get('level'),
-                "monsterType": card.get('race'),  # race -> monsterType
+                "name": card_name,
+                "nameEn": card_name,
+                "attribute": g('attribute'),
+                "atk": g('atk'),
+                "def": g('def'),
+                "level": g('level'),
+                "monsterType": g('race'),  # race -> monsterType
                 "type": base_type,  # Type simplifié
                 "isEffect": is_effect,
                 "isPendulum": is_pendulum,
                 "isLink": is_link,
-                "description": card.get('desc', '')  # desc -> description
+                "description": g('desc', '')  # desc -> description
             }
             
             # Ajouter archetype seulement s'il existe et n'est pas vide
-            archetype = card.get('archetype', '').strip()
+            archetype = g('archetype', '').strip()
             if archetype:
                 card_structure["archetype"] = archetype
             
@@ -294,96 +490,108 @@ class YuGiOhAutoSync:
         collection_cards = []
         card_counter = 1
         
+        # Valeurs constantes pour tout le set, calculées une seule fois
+        target_lower = set_code.lower()
+        target_upper = set_code.upper()
+        fr_prefix = f"{target_upper}-FR"
+        # Noms de sets normalisés, partagés entre les cartes
+        normalized_names = {}
+        # Lignes du dry-run, écrites en une seule fois à la fin
+        out_lines = []
+        
         for card in cards:
-            # Récupérer l'ID original de la carte
-            original_card_id = card.get('id')
-            card_name = card.get('name', 'Unknown')
-            card_type = card.get('type', 'Unknown')
-            card_race = card.get('race', 'Unknown')
-            card_attribute = card.get('attribute', 'Unknown')
-            
             # Chercher le bon set dans les card_sets de la carte
             card_id_fr = None
             matching_set_code = None
             
             if 'card_sets' in card and card['card_sets']:
                 for card_set in card['card_sets']:
-                    card_set_name = card_set.get('set_name', '').lower()
                     card_set_code = card_set.get('set_code', '')
                     
-                    # Normaliser le nom du set pour la comparaison
-                    normalized_set_name = self.normalize_set_name(card_set_name)
+                    # Vérifier si ce set correspond à notre recherche (préfixe du code d'abord)
+                    if not card_set_code.lower().startswith(target_lower):
+                        card_set_name = card_set.get('set_name', '')
+                        normalized_set_name = normalized_names.get(card_set_name)
+                        if normalized_set_name is None:
+                            normalized_set_name = self.normalize_set_name(card_set_name)
+                            normalized_names[card_set_name] = normalized_set_name
+                        if normalized_set_name != target_lower:
+                            continue
                     
-                    # Vérifier si ce set correspond à notre recherche
-                    if (normalized_set_name == set_code.lower() or 
-                        card_set_code.lower().startswith(set_code.lower())):
-                        
-                        matching_set_code = card_set_code
-                        # Convertir EN en FR dans le code du set
-                        if '-EN' in card_set_code:
-                            card_id_fr = card_set_code.replace('-EN', '-FR')
-                        else:
-                            # Si pas de -EN, ajouter -FR avec un numéro
-                            card_id_fr = f"{set_code.upper()}-FR{card_counter:03d}"
-                        break
+                    matching_set_code = card_set_code
+                    # Convertir EN en FR dans le code du set
+                    if '-EN' in card_set_code:
+                        card_id_fr = card_set_code.replace('-EN', '-FR')
+                    else:
+                        # Si pas de -EN, ajouter -FR avec un numéro
+                        card_id_fr = f"{fr_prefix}{card_counter:03d}"
+                    break
             
             # Si aucun set correspondant trouvé, utiliser une logique de fallback
             if not card_id_fr:
-                card_id_fr = f"{set_code.upper()}-FR{card_counter:03d}"
-                matching_set_code = f"{set_code.upper()}-EN{card_counter:03d}"
+                card_id_fr = f"{fr_prefix}{card_counter:03d}"
+                matching_set_code = f"{target_upper}-EN{card_counter:03d}"
             
             if dry_run:
-                print(f"\n=== CARTE #{card_counter} ===")
-                print(f"Nom: {card_name}")
-                print(f"Type: {card_type}")
-                print(f"Race: {card_race}")
-                print(f"Attribut: {card_attribute}")
-                print(f"ID original API: {original_card_id}")
-                print(f"Set code recherché: {set_code}")
-                print(f"Collection ID: {collection_id}")
+                # Récupérer les informations affichées uniquement en dry-run
+                original_card_id = card.get('id')
+                card_name = card.get('name', 'Unknown')
+                card_type = card.get('type', 'Unknown')
+                card_race = card.get('race', 'Unknown')
+                card_attribute = card.get('attribute', 'Unknown')
+                
+                out_lines.append(f"\n=== CARTE #{card_counter} ===")
+                out_lines.append(f"Nom: {card_name}")
+                out_lines.append(f"Type: {card_type}")
+                out_lines.append(f"Race: {card_race}")
+                out_lines.append(f"Attribut: {card_attribute}")
+                out_lines.append(f"ID original API: {original_card_id}")
+                out_lines.append(f"Set code recherché: {set_code}")
+                out_lines.append(f"Collection ID: {collection_id}")
                 
                 # Afficher les images disponibles
                 if 'card_images' in card and card['card_images']:
-                    print(f"Images disponibles: {len(card['card_images'])}")
+                    out_lines.append(f"Images disponibles: {len(card['card_images'])}")
                     for i, img in enumerate(card['card_images']):
-                        print(f"  Image {i+1}: {img.get('image_url', 'N/A')}")
+                        out_lines.append(f"  Image {i+1}: {img.get('image_url', 'N/A')}")
                 else:
-                    print("Aucune image disponible")
+                    out_lines.append("Aucune image disponible")
                 
                 # Afficher les sets de la carte
                 if 'card_sets' in card and card['card_sets']:
-                    print(f"Sets de la carte: {len(card['card_sets'])}")
+                    out_lines.append(f"Sets de la carte: {len(card['card_sets'])}")
                     for card_set in card['card_sets']:
                         set_name = card_set.get('set_name', 'N/A')
                         set_code_display = card_set.get('set_code', 'N/A')
                         marker = " ← CORRESPONDANCE" if set_code_display == matching_set_code else ""
-                        print(f"  Set: {set_name} - Code: {set_code_display}{marker}")
+                        out_lines.append(f"  Set: {set_name} - Code: {set_code_display}{marker}")
                 else:
-                    print("Aucun set trouvé pour cette carte")
+                    out_lines.append("Aucun set trouvé pour cette carte")
                 
-                print(f"Set code correspondant trouvé: {matching_set_code}")
-                print(f"ID français généré: {card_id_fr}")
-                print(f"Structure collection-cards qui sera créée:")
-                print(f"  id: {card_id_fr}")
-                print(f"  cardId: {card_id_fr}")
-                print(f"  collectionId: {set_code.upper()}")
-                print("=" * 50)
+                out_lines.append(f"Set code correspondant trouvé: {matching_set_code}")
+                out_lines.append(f"ID français généré: {card_id_fr}")
+                out_lines.append(f"Structure collection-cards qui sera créée:")
+                out_lines.append(f"  id: {card_id_fr}")
+                out_lines.append(f"  cardId: {card_id_fr}")
+                out_lines.append(f"  collectionId: {target_upper}")
+                out_lines.append("=" * 50)
             
             collection_card = {
                 "id": card_id_fr,
                 "cardId": card_id_fr,
-                "collectionId": set_code.upper()
+                "collectionId": target_upper
             }
             
             collection_cards.append(collection_card)
             card_counter += 1
         
         if dry_run:
-            print(f"\n🔍 RÉSUMÉ DU DRY-RUN:")
-            print(f"Total de cartes traitées: {len(collection_cards)}")
-            print(f"Set code utilisé: {set_code}")
-            print(f"Collection ID utilisé: {set_code.upper()}")
-            print(f"Fichier qui serait créé: collection-cards/{set_code}.json")
+            out_lines.append(f"\n🔍 RÉSUMÉ DU DRY-RUN:")
+            out_lines.append(f"Total de cartes traitées: {len(collection_cards)}")
+            out_lines.append(f"Set code utilisé: {set_code}")
+            out_lines.append(f"Collection ID utilisé: {target_upper}")
+            out_lines.append(f"Fichier qui serait créé: collection-cards/{set_code}.json")
+            sys.stdout.write('\n'.join(out_lines) + '\n')
             return None  # Ne pas retourner les données en mode dry-run
         
         return collection_cards
@@ -391,96 +599,117 @@ class YuGiOhAutoSync:
     def save_json_file(self, data, filepath):
         """Sauvegarde des données JSON dans un fichier"""
         try:
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            with open(filepath, 'w', encoding='utf-8') as file:
-                json.dump(data, file, ensure_ascii=False, indent=2)
+            write_json_bytes(filepath, data, compact=COMPACT_OUTPUT)
             print(f"✅ Fichier sauvegardé: {filepath}")
             return True
         except Exception as e:
             print(f"❌ Erreur lors de la sauvegarde de {filepath}: {e}")
             return False
     
-    def download_card_image(self, card_id, image_url):
-        """Télécharge et convertit une image de carte en WebP"""
+    def fetch_image_bytes(self, image_url):
+        """Télécharge une image et retourne son contenu brut"""
+        response = self.client.get(image_url)
+        response.raise_for_status()
+        return response.content
+    
+    def new_encode_pool(self):
+        """Crée le pool de processus d'encodage WebP"""
+        # Des threads HTTP tournent déjà : forker ce processus pourrait bloquer un worker sur un
+        # verrou hérité, les workers partent donc d'un processus neuf (forkserver, ou spawn)
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        return ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context(start_method)
+        )
+    
+    def submit_encode(self, image_bytes, output_path):
+        """Soumet un encodage WebP, en recréant le pool si un worker mort l'a cassé"""
+        # Pool de processus créé une seule fois pour toute la synchronisation
+        if self.encode_pool is None:
+            self.encode_pool = self.new_encode_pool()
+        try:
+            return self.encode_pool.submit(encode_card_webp, image_bytes, output_path)
+        except BrokenProcessPool:
+            print("⚠️ Pool d'encodage cassé (worker arrêté), recréation...")
+            self.encode_pool.shutdown(wait=False)
+            self.encode_pool = self.new_encode_pool()
+            return self.encode_pool.submit(encode_card_webp, image_bytes, output_path)
+    
+    def download_card_images(self, image_tasks):
+        """Télécharge les images de cartes (threads) et les convertit en WebP (processus)"""
         output_dir = "cards-image"
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, f"{card_id}.webp")
+        ensure_dir(output_dir)
         
-        # Vérifier si l'image existe déjà
-        if os.path.exists(output_path):
-            return True
+        # Ignorer les images déjà présentes
+        pending = [
+            (card_id, image_url) for card_id, image_url in image_tasks
+            if f"{card_id}.webp" not in self.downloaded_card_images
+        ]
+        if not pending:
+            return
         
-        try:
-            response = requests.get(image_url, timeout=30)
-            response.raise_for_status()
-            
-            image = Image.open(BytesIO(response.content))
-            
-            # Convertir en RGB si nécessaire
-            if image.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                if image.mode == 'P':
-                    image = image.convert('RGBA')
-                background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = background
-            elif image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Sauvegarder en WebP
-            image.save(output_path, "WEBP", quality=95)
-            return True
-            
-        except Exception as e:
-            print(f"⚠️ Erreur téléchargement image {card_id}: {e}")
-            return False
+        encodes = {}
+        with ThreadPoolExecutor(max_workers=IMAGE_MAX_WORKERS) as fetch_pool:
+            fetches = {
+                fetch_pool.submit(self.fetch_image_bytes, image_url): card_id
+                for card_id, image_url in pending
+            }
+            # Encoder chaque image dès que son téléchargement est terminé
+            for future in as_completed(fetches):
+                card_id = fetches[future]
+                try:
+                    image_bytes = future.result()
+                except Exception as e:
+                    print(f"⚠️ Erreur téléchargement image {card_id}: {e}")
+                    continue
+                filename = f"{card_id}.webp"
+                output_path = os.path.join(output_dir, filename)
+                try:
+                    encodes[self.submit_encode(image_bytes, output_path)] = (card_id, filename)
+                except Exception as e:
+                    # Pool inutilisable même après recréation : encoder dans ce processus
+                    print(f"⚠️ Pool d'encodage indisponible pour l'image {card_id} ({e}), encodage local")
+                    try:
+                        encode_card_webp(image_bytes, output_path)
+                    except Exception as e:
+                        print(f"⚠️ Erreur conversion image {card_id}: {e}")
+                        continue
+                    self.downloaded_card_images.add(filename)
+        
+        for future in as_completed(encodes):
+            card_id, filename = encodes[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"⚠️ Erreur conversion image {card_id}: {e}")
+                continue
+            self.downloaded_card_images.add(filename)
     
     def download_collection_image(self, collection_code, image_url):
-        os.makedirs("collections-image", exist_ok=True)
+        ensure_dir("collections-image")
         filename = f"{collection_code}.webp"
         filepath = os.path.join("collections-image", filename)
         
-        if os.path.exists(filepath):
+        if filename in self.downloaded_collection_images:
             print(f"Image already exists: {filepath}")
             return
         
         try:
-            response = requests.get(image_url)
+            response = self.client.get(image_url)
             response.raise_for_status()
             
             image = Image.open(BytesIO(response.content))
             image = image.convert("RGB")
             image.save(filepath, "WEBP", quality=85)
+            self.downloaded_collection_images.add(filename)
             print(f"Downloaded and saved: {filepath}")
         except Exception as e:
             print(f"Error downloading image for {collection_code}: {e}")
     
-    def load_existing_archetypes(self):
-        """Charge tous les archétypes existants depuis tous les fichiers JSON"""
-        existing_archetypes = set()
-        archetypes_dir = "archetypes"
-        
-        if not os.path.exists(archetypes_dir):
-            return existing_archetypes
-            
-        for filename in os.listdir(archetypes_dir):
-            if filename.endswith('.json'):
-                filepath = os.path.join(archetypes_dir, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        if isinstance(data, list):
-                            for archetype in data:
-                                if 'nameEn' in archetype:
-                                    existing_archetypes.add(archetype['nameEn'])
-                except (json.JSONDecodeError, FileNotFoundError):
-                    continue
-                    
-        return existing_archetypes
-
     def extract_unique_archetypes(self, cards):
         """Extrait les archétypes uniques des cartes qui n'existent pas déjà"""
-        # Charger les archétypes existants
-        existing_archetypes = self.load_existing_archetypes()
+        # Archétypes existants chargés une seule fois dans __init__
+        existing_archetypes = self.existing_archetypes
         
         archetypes = set()
         for card in cards:
@@ -507,7 +736,7 @@ class YuGiOhAutoSync:
         
         return archetype_structures
 
-    def process_new_set(self, set_data, dry_run=False):
+    def process_new_set(self, set_data, cards, dry_run=False):
         set_code = set_data['set_code']
         set_name = set_data.get('set_name', set_code)
         # Convertir le set_code en minuscules pour les noms de fichiers
@@ -517,8 +746,7 @@ class YuGiOhAutoSync:
         archetype_created = False
         
         try:
-            # Utiliser set_name pour l'API
-            cards = self.fetch_cards_for_set(set_name)
+            # Les cartes sont récupérées en amont par process_new_sets_parallel
             if not cards:
                 print(f"No cards found for set {set_name}")
                 return False, archetype_created
@@ -539,13 +767,14 @@ class YuGiOhAutoSync:
                 archetype_data = self.create_archetype_structure(unique_archetypes, file_code)
                 archetype_filename = f"archetypes/{file_code}.json"
                 if not dry_run:
-                    with open(archetype_filename, 'w', encoding='utf-8') as f:
-                        json.dump(archetype_data, f, ensure_ascii=False, indent=2)
+                    write_json_bytes(archetype_filename, archetype_data, compact=COMPACT_OUTPUT)
                     print(f"Saved archetype data: {archetype_filename} with new archetypes: {unique_archetypes}")
                     archetype_created = True
                 else:
                     print(f"[DRY RUN] Would save archetype data: {archetype_filename} with new archetypes: {unique_archetypes}")
                     archetype_created = True  # Pour le dry run aussi
+                # Les sets suivants de cette exécution connaissent déjà ces archétypes
+                self.existing_archetypes.update(unique_archetypes)
             else:
                 print(f"No new archetypes found for {set_code}, skipping archetype file creation")
             
@@ -558,18 +787,16 @@ class YuGiOhAutoSync:
             
             collection_filename = f"collections/{file_code}.json"
             if not dry_run:
-                with open(collection_filename, 'w', encoding='utf-8') as f:
-                    json.dump(collection_data, f, ensure_ascii=False, indent=2)
+                write_json_bytes(collection_filename, collection_data, compact=COMPACT_OUTPUT)
                 print(f"Saved collection data: {collection_filename}")
             else:
                 print(f"[DRY RUN] Would save collection data: {collection_filename}")
             
             # Generate cards data
-            cards_data = self.create_cards_structure(cards, file_code)
+            cards_data = self.create_cards_structure(cards, file_code, debug=self.debug)
             cards_filename = f"cards/{file_code}.json"
             if not dry_run:
-                with open(cards_filename, 'w', encoding='utf-8') as f:
-                    json.dump(cards_data, f, ensure_ascii=False, indent=2)
+                write_json_bytes(cards_filename, cards_data, compact=COMPACT_OUTPUT)
                 print(f"Saved cards data: {cards_filename}")
             else:
                 print(f"[DRY RUN] Would save cards data: {cards_filename}")
@@ -578,37 +805,88 @@ class YuGiOhAutoSync:
             collection_cards_data = self.create_collection_cards_structure(cards, file_code, file_code.upper(), dry_run)
             if collection_cards_data and not dry_run:
                 collection_cards_filename = f"collection-cards/{file_code}.json"
-                with open(collection_cards_filename, 'w', encoding='utf-8') as f:
-                    json.dump(collection_cards_data, f, ensure_ascii=False, indent=2)
+                write_json_bytes(collection_cards_filename, collection_cards_data, compact=COMPACT_OUTPUT)
                 print(f"Saved collection-cards data: {collection_cards_filename}")
             elif collection_cards_data and dry_run:
                 print(f"[DRY RUN] Would save collection-cards data: collection-cards/{file_code}.json")
             
             # Download card images (seulement si pas dry_run)
             if not dry_run:
-                for card in cards:
-                    if 'card_images' in card and card['card_images']:
-                        image_url = card['card_images'][0]['image_url']
-                        self.download_card_image(card['id'], image_url)
+                image_tasks = [
+                    (card['id'], card['card_images'][0]['image_url'])
+                    for card in cards
+                    if 'card_images' in card and card['card_images']
+                ]
+                # Les fichiers JSON du set sont déjà écrits : une erreur d'image ne doit pas faire échouer le set
+                try:
+                    self.download_card_images(image_tasks)
+                except Exception as e:
+                    print(f"⚠️ Erreur lors du traitement des images du set {set_code}: {e}")
             else:
                 print(f"[DRY RUN] Would download {len(cards)} card images")
             
+            self.existing_sets.add(file_code)
             print(f"✅ Set {set_name} traité avec succès (dry_run={dry_run})")
-            return True
+            return True, archetype_created
             
         except Exception as e:
             print(f"Error processing set {set_code}: {str(e)}")
             return False, archetype_created
     
-    def update_manifest(self, new_sets_processed=None, sets_with_archetypes=None):
-        """Met à jour le fichier manifest.json avec les nouveaux sets"""
-        manifest_path = "manifest.json"
+    def process_new_sets_parallel(self, new_sets, dry_run=False):
+        """Récupère les cartes des nouveaux sets en parallèle puis traite chaque set"""
+        processed_sets = []
+        sets_with_archetypes = []
         
+        # Utiliser set_name pour l'API, indexer les résultats par set_code
+        set_names = {}
+        for new_set in new_sets:
+            api_data = new_set['api_data']
+            set_code = api_data.get('set_code', new_set['suggested_code'])
+            set_names.setdefault(set_code, api_data.get('set_name', set_code))
+        
+        # Beaucoup de sets : une requête pour toute la base, regroupée localement
+        cards_by_name = {}
+        if len(set_names) >= BULK_FETCH_THRESHOLD:
+            cards_by_name = self.fetch_cards_for_sets(set_names.values())
+        
+        with ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS) as executor:
+            # Requête par set pour ceux qui n'ont pas été trouvés dans la base complète
+            futures = {
+                set_code: executor.submit(self.fetch_cards_for_set, set_name)
+                for set_code, set_name in set_names.items()
+                if set_name not in cards_by_name
+            }
+            
+            # Traiter les sets dans l'ordre, au fur et à mesure que leurs cartes arrivent
+            for new_set in new_sets:
+                api_data = new_set['api_data']
+                set_code = api_data.get('set_code', new_set['suggested_code'])
+                if set_code in futures:
+                    # Une erreur inattendue ne concerne que ce set : il est traité comme sans cartes
+                    try:
+                        cards = futures[set_code].result()
+                    except Exception as e:
+                        print(f"❌ Erreur lors de la récupération des cartes pour {set_names[set_code]}: {e}")
+                        cards = []
+                else:
+                    cards = cards_by_name[set_names[set_code]]
+                
+                success, has_archetypes = self.process_new_set(api_data, cards, dry_run)
+                if success:
+                    processed_sets.append(set_code.lower())
+                    if has_archetypes:
+                        sets_with_archetypes.append(set_code.lower())
+        
+        return processed_sets, sets_with_archetypes
+    
+    def load_manifest(self):
+        """Charge manifest.json une seule fois (structure par défaut s'il n'existe pas)"""
         try:
             # Charger le manifest existant
-            if os.path.exists(manifest_path):
-                with open(manifest_path, 'r', encoding='utf-8') as file:
-                    manifest = json.load(file)
+            if os.path.exists(MANIFEST_PATH):
+                with open(MANIFEST_PATH, 'rb') as file:
+                    manifest = json_loads(file.read())
             else:
                 # Structure par défaut si le manifest n'existe pas
                 manifest = {
@@ -667,6 +945,20 @@ class YuGiOhAutoSync:
                 if "updates" not in manifest["data"][section]:
                     manifest["data"][section]["updates"] = []
             
+            return manifest
+            
+        except Exception as e:
+            print(f"❌ Erreur lors du chargement du manifest: {e}")
+            return None
+    
+    def update_manifest(self, new_sets_processed=None, sets_with_archetypes=None):
+        """Met à jour le manifest en mémoire avec les nouveaux sets (voir flush_manifest)"""
+        manifest = self.manifest
+        if manifest is None:
+            print("❌ Manifest non chargé, mise à jour impossible")
+            return False
+        
+        try:
             # Incrémenter la version
             version_parts = manifest["version"].split(".")
             version_parts[2] = str(int(version_parts[2]) + 1)
@@ -676,43 +968,37 @@ class YuGiOhAutoSync:
             
             # Ajouter les nouveaux sets aux updates si fournis
             if new_sets_processed:
+                # Index {fichier: entrée} des fichiers déjà référencés, par section (premier gardé)
+                updates_by_file = {}
+                for section in ("cards", "collections", "collectionCards", "archetypes"):
+                    section_index = updates_by_file[section] = {}
+                    for update in manifest["data"][section]["updates"]:
+                        section_index.setdefault(update["file"], update)
+                sets_with_archetypes = set(sets_with_archetypes or ())
+                
                 for set_code in new_sets_processed:
-                    # Ajouter aux cards
-                    cards_update = {
-                        "file": f"cards/{set_code}.json",
-                        "date": current_time
-                    }
-                    if cards_update not in manifest["data"]["cards"]["updates"]:
-                        manifest["data"]["cards"]["updates"].append(cards_update)
-                    
-                    # Ajouter aux collections
-                    collections_update = {
-                        "file": f"collections/{set_code}.json",
-                        "date": current_time
-                    }
-                    if collections_update not in manifest["data"]["collections"]["updates"]:
-                        manifest["data"]["collections"]["updates"].append(collections_update)
-                    
-                    # Ajouter aux collectionCards
-                    collection_cards_update = {
-                        "file": f"collection-cards/{set_code}.json",
-                        "date": current_time
-                    }
-                    if collection_cards_update not in manifest["data"]["collectionCards"]["updates"]:
-                        manifest["data"]["collectionCards"]["updates"].append(collection_cards_update)
-                    
+                    # Ajouter aux cards, collections et collectionCards
+                    section_files = [
+                        ("cards", f"cards/{set_code}.json"),
+                        ("collections", f"collections/{set_code}.json"),
+                        ("collectionCards", f"collection-cards/{set_code}.json")
+                    ]
                     # Ajouter aux archetypes SEULEMENT si le set a des archetypes
-                    if sets_with_archetypes and set_code in sets_with_archetypes:
-                        archetypes_update = {
-                            "file": f"archetypes/{set_code}.json",
-                            "date": current_time
-                        }
-                        if archetypes_update not in manifest["data"]["archetypes"]["updates"]:
-                            manifest["data"]["archetypes"]["updates"].append(archetypes_update)
-            
-            # Sauvegarder
-            with open(manifest_path, 'w', encoding='utf-8') as file:
-                json.dump(manifest, file, ensure_ascii=False, indent=2)
+                    if set_code in sets_with_archetypes:
+                        section_files.append(("archetypes", f"archetypes/{set_code}.json"))
+                    
+                    for section, file_path in section_files:
+                        existing_update = updates_by_file[section].get(file_path)
+                        if existing_update is None:
+                            new_update = {
+                                "file": file_path,
+                                "date": current_time
+                            }
+                            manifest["data"][section]["updates"].append(new_update)
+                            updates_by_file[section][file_path] = new_update
+                        else:
+                            # Fichier régénéré : rafraîchir sa date pour que les clients le retéléchargent
+                            existing_update["date"] = current_time
             
             if new_sets_processed:
                 print(f"✅ Manifest mis à jour vers la version {manifest['version']} avec {len(new_sets_processed)} nouveaux sets")
@@ -726,8 +1012,25 @@ class YuGiOhAutoSync:
             traceback.print_exc()  # Pour plus de détails sur l'erreur
             return False
     
-    def run_sync(self, max_sets=None, dry_run=False):
-        """Lance la synchronisation avec option dry-run"""
+    def flush_manifest(self):
+        """Écrit le manifest en mémoire dans manifest.json"""
+        try:
+            write_json_atomic(MANIFEST_PATH, self.manifest)
+            return True
+        except Exception as e:
+            print(f"❌ Erreur lors de la sauvegarde du manifest: {e}")
+            return False
+    
+    def close(self):
+        """Libère le client HTTP et le pool d'encodage"""
+        self.client.close()
+        if self.encode_pool is not None:
+            self.encode_pool.shutdown()
+            self.encode_pool = None
+    
+    def run_sync(self, max_sets=None):
+        """Lance la synchronisation (dry-run selon le mode choisi à la création)"""
+        dry_run = self.dry_run
         try:
             print("🚀 Démarrage de la synchronisation Yu-Gi-Oh!")
             
@@ -756,28 +1059,15 @@ class YuGiOhAutoSync:
                 new_sets = new_sets[:max_sets]
                 print(f"🔢 Limitation à {max_sets} sets")
             
-            # Traiter chaque nouveau set
-            processed_sets = []
-            sets_with_archetypes = []
-            for i, new_set in enumerate(new_sets, 1):
-                # Accéder aux données correctement depuis la structure retournée par compare_sets
-                api_data = new_set['api_data']
-                set_name = api_data.get('set_name', 'Unknown Set')
-                set_code = api_data.get('set_code', new_set['suggested_code'])
-                
-                success, has_archetypes = self.process_new_set(api_data, dry_run)
-                if success:
-                    processed_sets.append(set_code.lower())
-                    if has_archetypes:
-                        sets_with_archetypes.append(set_code.lower())
-                
-                # Pause entre les sets pour éviter de surcharger l'API
-                if i < len(new_sets):
-                    time.sleep(1)
+            # Traiter les nouveaux sets (récupération des cartes en parallèle)
+            processed_sets, sets_with_archetypes = self.process_new_sets_parallel(new_sets, dry_run)
             
             if not dry_run and processed_sets:
                 # Mettre à jour le manifest
-                self.update_manifest(processed_sets, sets_with_archetypes)
+                if self.update_manifest(processed_sets, sets_with_archetypes):
+                    self.flush_manifest()
+                # Les nouveaux fichiers d'archétypes invalident le cache : le réécrire
+                self.save_scan_cache(self.max_archetype_id, self.existing_archetypes, self.max_collection_id)
             
             if dry_run:
                 print(f"\n🔍 DRY-RUN TERMINÉ:")
@@ -801,8 +1091,11 @@ def main():
     
     args = parser.parse_args()
     
-    sync = YuGiOhAutoSync()
-    sync.run_sync(max_sets=args.max_sets, dry_run=args.dry_run)
+    sync = YuGiOhAutoSync(dry_run=args.dry_run)
+    try:
+        sync.run_sync(max_sets=args.max_sets)
+    finally:
+        sync.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,11 +1,24 @@
 #!/usr/bin/env python3
-import json
 import sys
 import os
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
-from PIL.ExifTags import TAGS
 from io import BytesIO
+from http_session import SESSION
+from image_utils import FORCE_REDOWNLOAD, flatten_on_white
+from json_utils import JSON_ERRORS, json_loads
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Nombre de téléchargements simultanés
+MAX_WORKERS = 16
+
+# Effort de compression WebP (0-6) : 4 est bien plus rapide que 6 pour une taille quasi identique
+WEBP_METHOD = int(os.environ.get('WEBP_METHOD', '4'))
 
 def download_and_resize_image(card_id, output_dir):
     """
@@ -19,44 +32,35 @@ def download_and_resize_image(card_id, output_dir):
     # Garder l'ID complet pour le nom de fichier, mais en WebP
     output_path = os.path.join(output_dir, f"{card_id}.webp")
     
+    # Ne rien faire si l'image a déjà été téléchargée
+    if not FORCE_REDOWNLOAD and os.path.isfile(output_path):
+        return True
+    
     try:
         # Télécharger l'image
         print(f"Téléchargement de l'image pour l'ID: {card_id} depuis URL: {clean_id_for_url}")
-        response = requests.get(url, timeout=30)
+        response = SESSION.get(url, timeout=30)
         response.raise_for_status()
         
         # Ouvrir l'image avec PIL
         image = Image.open(BytesIO(response.content))
         
-        # Supprimer les métadonnées EXIF
-        if hasattr(image, '_getexif'):
-            # Créer une nouvelle image sans métadonnées
-            data = list(image.getdata())
-            image_without_exif = Image.new(image.mode, image.size)
-            image_without_exif.putdata(data)
-            image = image_without_exif
-        
         # Redimensionner à 60x84
         resized_image = image.resize((210, 306), Image.Resampling.LANCZOS)
         
-        # Convertir en RGB si nécessaire (WebP ne supporte pas tous les modes)
-        if resized_image.mode in ('RGBA', 'LA', 'P'):
-            # Créer un fond blanc pour les images avec transparence
-            background = Image.new('RGB', resized_image.size, (255, 255, 255))
-            if resized_image.mode == 'P':
-                resized_image = resized_image.convert('RGBA')
-            background.paste(resized_image, mask=resized_image.split()[-1] if resized_image.mode == 'RGBA' else None)
-            resized_image = background
-        elif resized_image.mode != 'RGB':
-            resized_image = resized_image.convert('RGB')
+        # Convertir en RGB avec un fond blanc pour la transparence (WebP ne supporte pas tous les modes)
+        resized_image = flatten_on_white(resized_image)
+        
+        # Supprimer les métadonnées (EXIF, profil ICC) : save() ne les écrit que si elles sont fournies
+        resized_image.info.pop('exif', None)
+        resized_image.info.pop('icc_profile', None)
         
         # Sauvegarder en WebP avec compression
         resized_image.save(
             output_path, 
             "WebP", 
             quality=80,  # Compression avec qualité 80%
-            method=6,    # Méthode de compression la plus efficace
-            optimize=True  # Optimisation supplémentaire
+            method=WEBP_METHOD
         )
         print(f"Image sauvegardée en WebP: {output_path}")
         
@@ -74,8 +78,13 @@ def process_json_file(json_path):
     Lit le fichier JSON et extrait les IDs des cartes
     """
     try:
-        with open(json_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
+        with open(json_path, 'rb') as file:
+            # Liste de cartes : lire uniquement les IDs en streaming, sans construire le document
+            is_list = file.read(64).lstrip().startswith(b'[')
+            file.seek(0)
+            if ijson is not None and is_list:
+                return list(ijson.items(file, 'item.id'))
+            data = json_loads(file.read())
         
         # Extraire les IDs
         card_ids = []
@@ -91,7 +100,7 @@ def process_json_file(json_path):
     except FileNotFoundError:
         print(f"Erreur: Le fichier {json_path} n'existe pas.")
         return []
-    except json.JSONDecodeError:
+    except JSON_ERRORS:
         print(f"Erreur: Le fichier {json_path} n'est pas un JSON valide.")
         return []
     except Exception as e:
@@ -123,11 +132,10 @@ def main():
     
     print(f"Trouvé {len(card_ids)} carte(s) à télécharger.")
     
-    # Télécharger et redimensionner les images
-    success_count = 0
-    for card_id in card_ids:
-        if download_and_resize_image(card_id, output_dir):
-            success_count += 1
+    # Télécharger et redimensionner les images en parallèle
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = list(executor.map(lambda card_id: download_and_resize_image(card_id, output_dir), card_ids))
+    success_count = sum(results)
     
     print(f"\nTerminé! {success_count}/{len(card_ids)} images téléchargées avec succès.")
     print("Les images sont maintenant en format WebP compressé sans métadonnées.")
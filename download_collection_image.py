@@ -4,6 +4,9 @@ import os
 import requests
 from PIL import Image
 from io import BytesIO
+from fs_utils import ensure_dir
+from http_session import SESSION
+from image_utils import FORCE_REDOWNLOAD, flatten_on_white
 
 def download_and_resize_collection_image(card_id, image_url):
     """
@@ -11,30 +14,29 @@ def download_and_resize_collection_image(card_id, image_url):
     """
     # Dossier de destination
     output_dir = "collections-image"
-    os.makedirs(output_dir, exist_ok=True)
+    ensure_dir(output_dir)
     
     # Chemin de sortie avec l'ID fourni
     output_path = os.path.join(output_dir, f"{card_id}.jpg")
     
+    # Ne rien faire si l'image a déjà été téléchargée
+    if not FORCE_REDOWNLOAD and os.path.isfile(output_path):
+        print(f"Image déjà présente: {output_path}")
+        return True
+    
     try:
         # Télécharger l'image
         print(f"Téléchargement de l'image pour l'ID: {card_id} depuis URL: {image_url}")
-        response = requests.get(image_url, timeout=30)
+        response = SESSION.get(image_url, timeout=30)
         response.raise_for_status()
         
         # Ouvrir l'image avec PIL
         image = Image.open(BytesIO(response.content))
+        # Décodage JPEG réduit (1/2, 1/4, 1/8) tant que l'image reste au moins 2x plus grande que la cible
+        image.draft('RGB', (120, 168))
         
-        # Convertir en RGB si l'image a un canal alpha (RGBA)
-        if image.mode in ('RGBA', 'LA', 'P'):
-            # Créer un fond blanc pour remplacer la transparence
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-            image = background
-        elif image.mode != 'RGB':
-            image = image.convert('RGB')
+        # Convertir en RGB avec un fond blanc pour remplacer la transparence
+        image = flatten_on_white(image)
         
         # Redimensionner à 60x84
         resized_image = image.resize((60, 84), Image.Resampling.LANCZOS)
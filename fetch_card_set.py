@@ -1,11 +1,159 @@
 #!/usr/bin/env python3
-import json
+import functools
+import hashlib
 import sys
 import os
 import requests
 import re
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from operator import itemgetter
+from typing import Any, List, TypedDict
+from http_session import SESSION
+from api_cache import read_cache, write_cache
+from json_utils import COMPACT_OUTPUT, JSON_ERRORS, json_dumps, json_loads, write_json_atomic
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Erreurs de décodage des réponses cardinfo.php : celles des parseurs JSON, plus msgspec
+CARDINFO_ERRORS = JSON_ERRORS + (msgspec.DecodeError,) if msgspec is not None else JSON_ERRORS
+
+# Numéro de la carte dans son code de set (ex: SDY-001 -> 1)
+_NUM_RE = re.compile(r'-(\d+)')
+# Clé de tri des cartes sans code dans le set : placées en dernier
+_NO_SET_CODE_KEY = 10**9
+
+def _seq(code):
+    """Numéro de la carte dans son code de set, 0 si absent (ex: SDY-001 -> 1)"""
+    # Cas courant PREFIXE-NNN sans regex ; sinon même résultat que _NUM_RE
+    tail = code.partition('-')[2]
+    if tail.isdecimal():
+        return int(tail)
+    match = _NUM_RE.search(code)
+    return int(match.group(1)) if match else 0
+
+# Champs fixes des cartes magie et piège
+_SPELL_FIELDS = {"attribute": "SPELL", "type": "Magic", "isPendulum": False, "isLink": False}
+_TRAP_FIELDS = {"attribute": "TRAP", "type": "Trap", "isPendulum": False, "isLink": False}
+# Types spéciaux de monstre, par ordre de priorité
+_SPECIAL_MONSTER_TYPES = ('Synchro', 'Fusion', 'Xyz', 'Link')
+
+# Champs de cardinfo.php réellement lus (images, prix, etc. ne sont jamais matérialisés)
+_CARD_FIELDS = ('id', 'name', 'name_en', 'desc', 'type', 'typeline', 'attribute',
+                'atk', 'def', 'level', 'race', 'archetype')
+# Schéma cardinfo.php pour msgspec : les champs absents du schéma sont ignorés en C, sans objet Python
+_CardSetInfo = TypedDict('_CardSetInfo', {'set_name': Any, 'set_code': Any}, total=False)
+_CardInfo = TypedDict('_CardInfo', {**{key: Any for key in _CARD_FIELDS}, 'card_sets': List[_CardSetInfo]}, total=False)
+_CardInfoResponse = TypedDict('_CardInfoResponse', {'data': List[_CardInfo]}, total=False)
+_CARDINFO_DECODER = msgspec.json.Decoder(_CardInfoResponse) if msgspec is not None else None
+# Parser simdjson réutilisé d'un appel à l'autre (son tampon interne est alloué une fois)
+_SIMDJSON_PARSER = simdjson.Parser() if simdjson is not None else None
+# Le parser n'est pas partageable entre threads : un seul document à la fois
+_SIMDJSON_LOCK = threading.Lock()
+
+# Nombre de fichiers d'archétypes lus en parallèle
+ARCHETYPE_READ_WORKERS = 8
+
+def fetch_cards(url):
+    """Récupère la liste data de cardinfo.php, depuis le cache disque s'il a moins d'une journée"""
+    cache_name = f"cardset-{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+    cached = read_cache(cache_name)
+    if cached is not None:
+        try:
+            return json_loads(cached)
+        except ValueError:
+            pass
+    
+    cards = download_cards(url)
+    # Un set vide n'est pas mis en cache : il peut apparaître dans l'API entre deux exécutions
+    if cards:
+        write_cache(cache_name, json_dumps(cards, compact=True))
+    return cards
+
+def _simdjson_value(value):
+    """Convertit un proxy simdjson (Array/Object) en valeur Python ordinaire"""
+    if isinstance(value, simdjson.Array):
+        return value.as_list()
+    if isinstance(value, simdjson.Object):
+        return value.as_dict()
+    return value
+
+def _simdjson_cards(doc):
+    """Copie les champs utilisés de chaque carte d'un document simdjson en valeurs Python ordinaires"""
+    cards = []
+    for card in doc.get('data') or ():
+        slim = {key: _simdjson_value(card[key]) for key in _CARD_FIELDS if key in card}
+        card_sets = card.get('card_sets')
+        if card_sets:
+            slim['card_sets'] = [{'set_name': info.get('set_name'), 'set_code': info.get('set_code')}
+                                 for info in card_sets]
+        cards.append(slim)
+    return cards
+
+def download_cards(url):
+    """Télécharge la liste data de cardinfo.php, en ne gardant que les champs utilisés si msgspec ou simdjson est disponible"""
+    if _CARDINFO_DECODER is None and _SIMDJSON_PARSER is None and ijson is not None:
+        # Sans msgspec ni simdjson, décoder au fil du téléchargement plutôt qu'après avoir tout reçu
+        with SESSION.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            return list(ijson.items(response.raw, 'data.item', use_float=True))
+    
+    response = SESSION.get(url, timeout=30)
+    response.raise_for_status()
+    if _CARDINFO_DECODER is not None:
+        return _CARDINFO_DECODER.decode(response.content).get('data') or []
+    if _SIMDJSON_PARSER is None:
+        return json_loads(response.content).get('data') or []
+    
+    # Le document est libéré dès le retour : le parser refuse d'être réutilisé tant qu'un proxy existe
+    with _SIMDJSON_LOCK:
+        return _simdjson_cards(_SIMDJSON_PARSER.parse(response.content))
+
+def archetype_files(archetypes_dir):
+    """Liste les fichiers JSON du dossier archetypes avec leur signature (mtime, taille)"""
+    # La signature sert de clé au cache de read_archetype_files
+    files = []
+    with os.scandir(archetypes_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json') and entry.is_file():
+                stat = entry.stat()
+                files.append((entry.path, stat.st_mtime_ns, stat.st_size))
+    return tuple(files)
+
+def read_archetype_file(filepath):
+    """Lit un fichier d'archétypes, liste vide en cas d'erreur"""
+    try:
+        with open(filepath, 'rb') as file:
+            return json_loads(file.read())
+    except Exception as e:
+        print(f"Erreur lors du chargement de {filepath}: {e}")
+        return []
+
+@functools.lru_cache(maxsize=1)
+def _read_archetype_files_cached(signature):
+    """Lit en parallèle les fichiers de la signature donnée"""
+    # Les lectures disque relâchent le GIL
+    with ThreadPoolExecutor(max_workers=ARCHETYPE_READ_WORKERS) as executor:
+        return tuple(executor.map(read_archetype_file, [filepath for filepath, _, _ in signature]))
+
+def read_archetype_files(archetypes_dir):
+    """Lit tous les fichiers d'archétypes, relus seulement si l'un d'eux a changé depuis le dernier appel"""
+    return _read_archetype_files_cached(archetype_files(archetypes_dir))
 
 def load_existing_archetypes():
     """Charge tous les archétypes existants depuis le dossier archetypes"""
@@ -13,17 +161,10 @@ def load_existing_archetypes():
     archetypes_dir = "archetypes"
     
     if os.path.exists(archetypes_dir):
-        for filename in os.listdir(archetypes_dir):
-            if filename.endswith('.json'):
-                filepath = os.path.join(archetypes_dir, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as file:
-                        archetype_data = json.load(file)
-                        for archetype in archetype_data:
-                            if 'nameEn' in archetype:
-                                archetypes[archetype['nameEn']] = archetype
-                except Exception as e:
-                    print(f"Erreur lors du chargement de {filepath}: {e}")
+        for archetype_data in read_archetype_files(archetypes_dir):
+            for archetype in archetype_data:
+                if 'nameEn' in archetype:
+                    archetypes[archetype['nameEn']] = archetype
     
     return archetypes
 
@@ -33,60 +174,52 @@ def get_max_archetype_id():
     archetypes_dir = "archetypes"
     
     if os.path.exists(archetypes_dir):
-        for filename in os.listdir(archetypes_dir):
-            if filename.endswith('.json'):
-                filepath = os.path.join(archetypes_dir, filename)
+        for archetype_data in read_archetype_files(archetypes_dir):
+            for archetype in archetype_data:
                 try:
-                    with open(filepath, 'r', encoding='utf-8') as file:
-                        archetype_data = json.load(file)
-                        for archetype in archetype_data:
-                            try:
-                                archetype_id = int(archetype.get('id', 0))
-                                max_id = max(max_id, archetype_id)
-                            except (ValueError, TypeError):
-                                pass
-                except Exception as e:
-                    print(f"Erreur lors du chargement de {filepath}: {e}")
+                    archetype_id = int(archetype.get('id', 0))
+                    max_id = max(max_id, archetype_id)
+                except (ValueError, TypeError):
+                    pass
     
     return max_id
 
-def save_archetype_to_file(archetype_name_en, filename="base.json"):
-    """Ajoute un nouvel archétype au fichier spécifié"""
+def save_archetypes_to_file(archetype_names, archetypes_by_name, next_id, filename="base.json"):
+    """Ajoute les nouveaux archétypes au fichier spécifié en une seule écriture (met à jour archetypes_by_name et next_id)"""
+    # Index de tous les archétypes connus : plus besoin de parcourir les fichiers
+    archetype_names = [n for n in archetype_names if n not in archetypes_by_name]
+    if not archetype_names:
+        return  # Les archétypes existent déjà
+    
     filepath = os.path.join("archetypes", filename)
     
     # Charger le fichier existant ou créer une liste vide
     archetypes = []
     if os.path.exists(filepath):
         try:
-            with open(filepath, 'r', encoding='utf-8') as file:
-                archetypes = json.load(file)
+            with open(filepath, 'rb') as file:
+                archetypes = json_loads(file.read())
         except Exception as e:
             print(f"Erreur lors du chargement de {filepath}: {e}")
     
-    # Vérifier si l'archétype existe déjà
-    for archetype in archetypes:
-        if archetype.get('nameEn') == archetype_name_en:
-            return  # L'archétype existe déjà
-    
-    # Récupérer l'ID maximum global de tous les fichiers d'archétypes
-    max_global_id = get_max_archetype_id()
-    new_id = str(max_global_id + 1)
-    
-    # Ajouter le nouvel archétype
-    new_archetype = {
-        "id": new_id,
-        "name": archetype_name_en,  # À compléter manuellement
-        "nameEn": archetype_name_en
-    }
-    
-    archetypes.append(new_archetype)
+    for archetype_name_en in archetype_names:
+        # ID suivant, tenu à jour d'un appel à l'autre au lieu de relire tous les fichiers
+        new_id = str(next_id[0])
+        next_id[0] += 1
+        
+        # Ajouter le nouvel archétype
+        new_archetype = {
+            "id": new_id,
+            "name": archetype_name_en,  # À compléter manuellement
+            "nameEn": archetype_name_en
+        }
+        
+        archetypes.append(new_archetype)
+        archetypes_by_name[archetype_name_en] = new_archetype
+        print(f"Nouvel archétype ajouté: {archetype_name_en} (ID: {new_id})")
     
     # Sauvegarder le fichier
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, 'w', encoding='utf-8') as file:
-        json.dump(archetypes, file, ensure_ascii=False, indent=2)
-    
-    print(f"Nouvel archétype ajouté: {archetype_name_en} (ID: {new_id})")
+    write_json_atomic(filepath, archetypes, compact=COMPACT_OUTPUT)
 
 def create_collection_file(name, card_set, code_prefix):
     """Crée le fichier de collection correspondant"""
@@ -99,10 +232,7 @@ def create_collection_file(name, card_set, code_prefix):
     }]
     
     collection_file = f"collections/{name}.json"
-    os.makedirs(os.path.dirname(collection_file), exist_ok=True)
-    
-    with open(collection_file, 'w', encoding='utf-8') as file:
-        json.dump(collection_data, file, ensure_ascii=False, indent=2)
+    write_json_atomic(collection_file, collection_data, compact=COMPACT_OUTPUT)
     
     print(f"Fichier de collection créé: {collection_file}")
     return True
@@ -110,14 +240,13 @@ def create_collection_file(name, card_set, code_prefix):
 def increment_version(version):
     """Incrémente la version (format x.y.z)"""
     try:
-        parts = version.split('.')
-        if len(parts) == 3:
+        head, sep, patch = version.rpartition('.')
+        if sep and head.count('.') == 1:
             # Incrémenter la version patch (z)
-            parts[2] = str(int(parts[2]) + 1)
-            return '.'.join(parts)
-        else:
-            return version
-    except:
+            return f"{head}.{int(patch) + 1}"
+        return version
+    except (AttributeError, ValueError):
+        # Version absente ou non numérique : la laisser telle quelle
         return version
 
 def update_manifest(name, created_archetype_file=False):
@@ -129,8 +258,8 @@ def update_manifest(name, created_archetype_file=False):
         # Charger le manifest existant
         manifest = {}
         if os.path.exists(manifest_file):
-            with open(manifest_file, 'r', encoding='utf-8') as file:
-                manifest = json.load(file)
+            with open(manifest_file, 'rb') as file:
+                manifest = json_loads(file.read())
         
         # Incrémenter la version
         current_version = manifest.get('version', '0.0.0')
@@ -160,11 +289,14 @@ def update_manifest(name, created_archetype_file=False):
                     'updates': []
                 }
             
-            # Vérifier si le fichier existe déjà dans les updates
+            # Vérifier si le fichier existe déjà dans les updates (index par fichier, premier gardé)
             updates = manifest['data'][section_name]['updates']
-            file_exists = any(update['file'] == file_path for update in updates)
+            updates_by_file = {}
+            for update in updates:
+                updates_by_file.setdefault(update['file'], update)
+            existing_update = updates_by_file.get(file_path)
             
-            if not file_exists:
+            if existing_update is None:
                 # Ajouter le nouveau fichier
                 new_update = {
                     'file': file_path,
@@ -174,15 +306,11 @@ def update_manifest(name, created_archetype_file=False):
                 print(f"Ajouté au manifest: {file_path}")
             else:
                 # Mettre à jour la date du fichier existant
-                for update in updates:
-                    if update['file'] == file_path:
-                        update['date'] = current_time
-                        print(f"Mis à jour dans le manifest: {file_path}")
-                        break
+                existing_update['date'] = current_time
+                print(f"Mis à jour dans le manifest: {file_path}")
         
         # Sauvegarder le manifest
-        with open(manifest_file, 'w', encoding='utf-8') as file:
-            json.dump(manifest, file, ensure_ascii=False, indent=2)
+        write_json_atomic(manifest_file, manifest)
         
         print(f"Manifest mis à jour: version {current_version} -> {new_version}")
         return True
@@ -198,172 +326,130 @@ def fetch_card_set(card_set, name, collection_id, code_prefix):
     """
     # Charger les archétypes existants
     existing_archetypes = load_existing_archetypes()
-    new_archetypes = set()
-    created_archetype_file = False
+    next_archetype_id = [get_max_archetype_id() + 1]
+    # Dict utilisé comme ensemble ordonné : les IDs suivent l'ordre d'apparition
+    new_archetypes = {}
     
     # Créer le fichier de collection
     create_collection_file(name, card_set, code_prefix)
     
-    # Construire l'URL de l'API avec langue française
+    # URL de l'API en français, et sans langue pour récupérer les cartes manquantes
     url_fr = f"https://db.ygoprodeck.com/api/v7/cardinfo.php?cardset={card_set}&language=fr"
+    url_en = f"https://db.ygoprodeck.com/api/v7/cardinfo.php?cardset={card_set}"
     
     try:
-        # Premier appel avec langue française
-        print(f"Récupération des données pour le set: {card_set} (FR)")
-        response_fr = requests.get(url_fr, timeout=30)
-        response_fr.raise_for_status()
-        api_data_fr = response_fr.json()
+        # Les deux appels partent en même temps (2 requêtes, bien sous la limite de l'API)
+        print(f"Récupération des données pour le set: {card_set} (FR + EN)")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            future_fr = executor.submit(fetch_cards, url_fr)
+            future_en = executor.submit(fetch_cards, url_en)
+            cards_fr = future_fr.result()
+            cards_en = future_en.result()
         
         # Vérifier si des cartes ont été trouvées
-        if 'data' not in api_data_fr or not api_data_fr['data']:
+        if not cards_fr:
             print(f"Aucune carte trouvée pour le set: {card_set}")
             return False
         
-        # Attendre 5 secondes
-        print("Attente de 5 secondes avant le second appel...")
-        time.sleep(5)
-        
-        # Second appel sans langue pour récupérer les cartes manquantes
-        url_en = f"https://db.ygoprodeck.com/api/v7/cardinfo.php?cardset={card_set}"
-        print(f"Récupération des données pour le set: {card_set} (EN)")
-        response_en = requests.get(url_en, timeout=30)
-        response_en.raise_for_status()
-        api_data_en = response_en.json()
-        
         # Fusionner les données - ajouter les cartes manquantes
-        cards_fr_ids = {str(card.get('id', '')) for card in api_data_fr['data']}
+        fr_by_id = {str(card.get('id', '')): card for card in cards_fr}
         
-        if 'data' in api_data_en and api_data_en['data']:
-            for card_en in api_data_en['data']:
-                card_id = str(card_en.get('id', ''))
-                if card_id not in cards_fr_ids:
-                    print(f"Ajout de la carte manquante: {card_en.get('name', '')} (ID: {card_id})")
-                    api_data_fr['data'].append(card_en)
+        for card_en in cards_en:
+            card_id = str(card_en.get('id', ''))
+            if card_id not in fr_by_id:
+                print(f"Ajout de la carte manquante: {card_en.get('name', '')} (ID: {card_id})")
+                cards_fr.append(card_en)
         
         # Transformer les données au format souhaité
-        formatted_cards = []
-        collection_cards = []
+        # Chaque ligne : (clé de tri, carte formatée, entrée collection-cards ou None)
+        rows = []
+        append_row = rows.append
         
-        for card in api_data_fr['data']:
-            card_type = card.get('type', '')
-            typeline = card.get('typeline', '')
-            is_effect = 'Effect' in typeline
+        for card in cards_fr:
+            g = card.get
+            card_name = g('name', '')
+            card_type = g('type', '')
+            # typeline est une liste de jetons dans l'API v7 (ex: ["Spellcaster", "Synchro", "Effect"])
+            typeline = g('typeline') or ()
+            type_tokens = set(typeline.split() if isinstance(typeline, str) else typeline)
+            is_effect = 'Effect' in type_tokens
             is_spell = 'Spell' in card_type
             is_trap = 'Trap' in card_type
             
-            # Créer la carte formatée avec les champs communs
-            formatted_card = {
-                "id": str(card.get('id', '')),
-                "name": card.get('name', ''),
-                "nameEn": card.get('name_en', card.get('name', '')),  # Fallback sur name si name_en n'existe pas
-                "description": card.get('desc', '')
+            # Champs communs, dans l'ordre des fichiers cards/
+            base = {
+                "id": str(g('id', '')),
+                "name": card_name,
+                "nameEn": g('name_en', card_name),  # Fallback sur name si name_en n'existe pas
+                "description": g('desc', ''),
+                "isEffect": is_effect
             }
-
-            formatted_card["isEffect"] = is_effect
             
             # Gérer les cartes magie et piège
             if is_spell:
-                formatted_card["attribute"] = "SPELL"
-                formatted_card["type"] = "Magic"
-                formatted_card["isPendulum"] = False
-                formatted_card["isLink"] = False
+                formatted_card = {**base, **_SPELL_FIELDS}
             elif is_trap:
-                formatted_card["attribute"] = "TRAP"
-                formatted_card["type"] = "Trap"
-                formatted_card["isPendulum"] = False
-                formatted_card["isLink"] = False
+                formatted_card = {**base, **_TRAP_FIELDS}
             else:
-                # C'est une carte monstre, ajouter tous les champs
-                formatted_card["attribute"] = card.get('attribute', '')
-                formatted_card["atk"] = card.get('atk', 0)
-                formatted_card["def"] = card.get('def', 0)
-                formatted_card["level"] = card.get('level', 0)
-                formatted_card["monsterType"] = card.get('race', '')
+                # C'est une carte monstre : simplifier le type de monstre
+                # Vérifier d'abord les types spéciaux dans typeline, sinon utiliser is_effect
+                monster_type = next((t for t in _SPECIAL_MONSTER_TYPES if t in type_tokens),
+                                    "Effect" if is_effect else "Normal")
                 
-                # Simplifier le type de monstre
-                # Vérifier d'abord les types spéciaux dans typeline
-                if 'Synchro' in typeline:
-                    formatted_card["type"] = "Synchro"
-                elif 'Fusion' in typeline:
-                    formatted_card["type"] = "Fusion"
-                elif 'Xyz' in typeline:
-                    formatted_card["type"] = "Xyz"
-                elif 'Link' in typeline:
-                    formatted_card["type"] = "Link"
-                # Sinon, utiliser is_effect pour déterminer le type
-                elif is_effect:
-                    formatted_card["type"] = "Effect"
-                else:
-                    formatted_card["type"] = "Normal"
-                
-                formatted_card["isEffect"] = is_effect
-                formatted_card["isPendulum"] = 'Pendulum' in card.get('type', '')
-                formatted_card["isLink"] = 'Link' in card.get('type', '')
+                formatted_card = {
+                    **base,
+                    "attribute": g('attribute', ''),
+                    "atk": g('atk', 0),
+                    "def": g('def', 0),
+                    "level": g('level', 0),
+                    "monsterType": g('race', ''),
+                    "type": monster_type,
+                    "isPendulum": 'Pendulum' in card_type,
+                    "isLink": 'Link' in card_type
+                }
             
             # Gérer les archétypes
-            if card.get('archetype'):
-                archetype_name_en = card.get('archetype')
+            archetype_name_en = g('archetype')
+            if archetype_name_en:
                 formatted_card["archetype"] = archetype_name_en
                 
-                # Vérifier si l'archétype existe dans les fichiers
-                if archetype_name_en not in existing_archetypes and archetype_name_en not in new_archetypes:
-                    new_archetypes.add(archetype_name_en)
-                    save_archetype_to_file(archetype_name_en, f"{name}.json")
-                    created_archetype_file = True
-                
-            formatted_cards.append(formatted_card)
+                # Vérifier si l'archétype existe dans les fichiers (écriture groupée après la boucle)
+                if archetype_name_en not in existing_archetypes:
+                    new_archetypes[archetype_name_en] = None
             
             # Créer l'entrée pour collection-cards
             # Chercher le set_code correspondant dans card_sets
-            set_code = None
-            if 'card_sets' in card:
-                for card_set_info in card['card_sets']:
-                    if card_set_info.get('set_name') == card_set:
-                        set_code = card_set_info.get('set_code')
-                        break
+            set_code = next((info.get('set_code') for info in g('card_sets') or ()
+                             if info.get('set_name') == card_set), None)
             
             if set_code:
                 collection_card = {
                     "id": set_code,
-                    "cardId": str(card.get('id', '')),
+                    "cardId": base["id"],
                     "collectionId": collection_id
                 }
-                collection_cards.append(collection_card)
-        
-        # Trier les cartes de collection par code (SDY-001, SDY-002, etc.)
-        def extract_number(item):
-            # Extraire le numéro du code (ex: SDY-001 -> 1)
-            match = re.search(r'-(\d+)', item['id'])
-            if match:
-                return int(match.group(1))
-            return 0
-        
-        # Trier les deux listes
-        collection_cards.sort(key=extract_number)
-        
-        # Pour les cartes formatées, on les trie en fonction de leur position dans collection_cards
-        # Créer un dictionnaire pour associer cardId à sa position dans collection_cards
-        card_positions = {}
-        for i, card in enumerate(collection_cards):
-            card_positions[card['cardId']] = i
+                sort_key = _seq(set_code)
+            else:
+                collection_card = None
+                sort_key = _NO_SET_CODE_KEY
+            append_row((sort_key, formatted_card, collection_card))
         
-        # Trier formatted_cards en fonction de la position dans collection_cards
-        def get_card_position(card):
-            return card_positions.get(card['id'], 999999)  # Valeur élevée pour les cartes sans position
+        # Enregistrer tous les nouveaux archétypes en une fois
+        if new_archetypes:
+            save_archetypes_to_file(new_archetypes, existing_archetypes, next_archetype_id, f"{name}.json")
         
-        formatted_cards.sort(key=get_card_position)
+        # Trier une seule fois par code (SDY-001, SDY-002, etc.), les deux listes suivent le même ordre
+        rows.sort(key=itemgetter(0))
+        formatted_cards = [row[1] for row in rows]
+        collection_cards = [row[2] for row in rows if row[2] is not None]
         
         # Créer le fichier cards/{name}.json
         cards_file = f"cards/{name}.json"
-        os.makedirs(os.path.dirname(cards_file), exist_ok=True)
-        with open(cards_file, 'w', encoding='utf-8') as file:
-            json.dump(formatted_cards, file, ensure_ascii=False, indent=2)
+        write_json_atomic(cards_file, formatted_cards, compact=COMPACT_OUTPUT)
         
         # Créer le fichier collection-cards/{name}.json
         collection_file = f"collection-cards/{name}.json"
-        os.makedirs(os.path.dirname(collection_file), exist_ok=True)
-        with open(collection_file, 'w', encoding='utf-8') as file:
-            json.dump(collection_cards, file, ensure_ascii=False, indent=2)
+        write_json_atomic(collection_file, collection_cards, compact=COMPACT_OUTPUT)
         
         print(f"Fichiers créés avec succès:")
         print(f"  - {cards_file}")
@@ -376,14 +462,14 @@ def fetch_card_set(card_set, name, collection_id, code_prefix):
         
         # Mettre à jour le manifest.json
         print("\nMise à jour du manifest.json...")
-        update_manifest(name, created_archetype_file)
+        update_manifest(name, bool(new_archetypes))
         
         return True
         
     except requests.exceptions.RequestException as e:
         print(f"Erreur lors de la récupération des données: {e}")
         return False
-    except json.JSONDecodeError as e:
+    except CARDINFO_ERRORS as e:
         print(f"Erreur lors du décodage JSON: {e}")
         return False
     except Exception as e:
@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+import functools
+import os
+
+@functools.lru_cache(maxsize=None)
+def ensure_dir(path):
+    """Crée le dossier s'il n'existe pas (une seule fois par processus et par chemin)"""
+    os.makedirs(path or '.', exist_ok=True)
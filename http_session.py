@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# Codes HTTP transitoires rejoués automatiquement (429 respecte l'en-tête Retry-After)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Session partagée par les scripts : connexions TCP/TLS réutilisées entre les requêtes
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=RETRY_STATUSES)
+))
+# urllib3 ne sait décompresser brotli que si le module est installé
+SESSION.headers['Accept-Encoding'] = 'br, gzip' if brotli is not None else 'gzip'
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+import os
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# FORCE_REDOWNLOAD=1 pour retélécharger les images déjà présentes
+FORCE_REDOWNLOAD = bool(os.environ.get('FORCE_REDOWNLOAD'))
+
+def flatten_on_white(image):
+    """Convertit une image en RGB, la transparence étant remplacée par un fond blanc"""
+    if image.mode == 'P':
+        image = image.convert('RGBA')
+    if image.mode != 'RGBA':
+        return image if image.mode == 'RGB' else image.convert('RGB')
+    
+    if np is None:
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    
+    # Mélange avec le blanc en une seule passe NumPy : (c * a + 255 * (255 - a)) / 255
+    pixels = np.asarray(image, dtype=np.uint16)
+    alpha = pixels[..., 3:4]
+    rgb = (pixels[..., :3] * alpha + 255 * (255 - alpha)) // 255
+    return Image.fromarray(rgb.astype(np.uint8))
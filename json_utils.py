@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+import json
+import os
+from fs_utils import ensure_dir
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Erreurs de décodage possibles selon le parseur utilisé
+JSON_ERRORS = (json.JSONDecodeError, ijson.JSONError) if ijson is not None else (json.JSONDecodeError,)
+
+# Fichiers de données servis par le CDN en JSON compact (CARD_CDN_PRETTY=1 pour les indenter en local).
+# manifest.json, suivi dans git, reste toujours indenté.
+COMPACT_OUTPUT = not os.environ.get('CARD_CDN_PRETTY')
+
+def json_loads(data):
+    """Décode du JSON (bytes ou str), avec orjson si disponible"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps(data, compact=False):
+    """Encode en JSON (bytes UTF-8), indenté ou compact sur une ligne, avec orjson si disponible"""
+    if orjson is not None:
+        layout = orjson.OPT_APPEND_NEWLINE if compact else orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=layout | orjson.OPT_NON_STR_KEYS)
+    if compact:
+        return (json.dumps(data, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+def write_json_bytes(path, data, compact=False, fsync=False):
+    """Écrit data en JSON dans path en un seul appel système, sans tampon Python"""
+    payload = memoryview(json_dumps(data, compact))
+    ensure_dir(os.path.dirname(path))
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        while payload:
+            payload = payload[os.write(fd, payload):]
+        if fsync:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def get_json(http, url, **kwargs):
+    """GET via http (session requests ou client httpx) puis décode le corps en bytes"""
+    response = http.get(url, **kwargs)
+    response.raise_for_status()
+    return json_loads(response.content)
+
+def write_json_atomic(path, data, compact=False):
+    """Écrit data en JSON dans un fichier temporaire synchronisé puis le renomme : jamais de fichier à moitié écrit"""
+    tmp_path = f"{path}.tmp"
+    write_json_bytes(tmp_path, data, compact, fsync=True)
+    os.replace(tmp_path, path)